@@ -1,8 +1,8 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+import json
 import logging
 import time
 import os
-import threading
 
 from milvus_client import MilvusClient
 from config import Config
@@ -23,7 +23,6 @@ logger = logging.getLogger(__name__)
 
 # Global objects
 milvus_client = None
-processing_lock = threading.Lock()
 
 def initialize_services():
     """Servisleri başlat"""
@@ -45,6 +44,24 @@ try:
 except Exception as e:
     logger.error(f"Startup initialization error: {e}")
 
+def validate_scope(data, fields):
+    """Silme ifadesine girecek alanları doğrula; hata mesajı veya None döndür"""
+    for field in fields:
+        value = data.get(field)
+        if field in ('project_name', 'timecode'):
+            if not isinstance(value, str) or not value or '"' in value or '\\' in value:
+                return f'{field} must be a non-empty string without quotes or backslashes'
+        elif not isinstance(value, int) or isinstance(value, bool):
+            return f'{field} must be an integer'
+    return None
+
+def validate_flags(data, flags):
+    """Bayrakların gerçek JSON boolean olduğunu doğrula; hata mesajı veya None döndür"""
+    for flag in flags:
+        if not isinstance(data.get(flag, False), bool):
+            return f'{flag} must be a boolean'
+    return None
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Sistem durumu"""
@@ -88,6 +105,12 @@ def insert_sentences():
         if embeddings and len(embeddings[0]) != Config.EMBEDDING_DIM:
             return jsonify({'error': f'Embedding dimension must be {Config.EMBEDDING_DIM}'}), 400
         
+        # replace (ve eski şemada upsert) bu alanlardan silme ifadesi oluşturur
+        error = (validate_scope(data, ['project_name', 'season', 'episode_number', 'timecode'])
+                 or validate_flags(data, ['upsert', 'replace']))
+        if error:
+            return jsonify({'error': error}), 400
+        
         # Insert to Milvus
         success = milvus_client.insert_sentences(
             sentences=sentences,
@@ -95,7 +118,9 @@ def insert_sentences():
             season=data['season'],
             episode_number=data['episode_number'],
             timecode=data['timecode'],
-            embeddings=embeddings
+            embeddings=embeddings,
+            upsert=data.get('upsert', False),
+            replace=data.get('replace', False)
         )
         
         if success:
@@ -111,6 +136,56 @@ def insert_sentences():
         logger.error(f"Insert error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/delete_sentences', methods=['POST'])
+def delete_sentences():
+    """Bölüm veya sezon bazlı toplu silme"""
+    try:
+        data = request.json
+        
+        # Validation
+        for field in ['project_name', 'season']:
+            if field not in data:
+                return jsonify({'error': f'Missing field: {field}'}), 400
+        
+        # Toplu silme kapsamı açıkça belirtilmeli: varsayılan tek bölüm, tüm sezon için "scope": "season"
+        delete_scope = data.get('scope', 'episode')
+        if delete_scope == 'episode':
+            scope_fields = ['project_name', 'season', 'episode_number']
+        elif delete_scope == 'season':
+            if 'episode_number' in data:
+                return jsonify({'error': 'episode_number is not allowed with scope "season"'}), 400
+            scope_fields = ['project_name', 'season']
+        else:
+            return jsonify({'error': 'scope must be "episode" or "season"'}), 400
+        
+        error = validate_scope(data, scope_fields) or validate_flags(data, ['compact'])
+        if error:
+            return jsonify({'error': error}), 400
+        
+        deleted = milvus_client.delete_sentences(
+            project_name=data['project_name'],
+            season=data['season'],
+            episode_number=data['episode_number'] if delete_scope == 'episode' else None,
+            compact=data.get('compact', False)
+        )
+        
+        if deleted is None:
+            return jsonify({'error': 'Delete failed'}), 500
+        
+        scope = f"{data['project_name']} - S{data['season']}"
+        if delete_scope == 'episode':
+            scope += f"E{data['episode_number']}"
+        return jsonify({
+            'status': 'success',
+            'message': f'Deleted {deleted} sentences',
+            'deleted_count': deleted,
+            'scope': scope
+        })
+    
+    except Exception as e:
+        logger.error(f"Delete error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/search_sentences', methods=['POST'])
 def search_sentences():
     """Hazır embedding'lerle arama"""
@@ -127,11 +202,20 @@ def search_sentences():
         if query_embeddings and len(query_embeddings[0]) != Config.EMBEDDING_DIM:
             return jsonify({'error': f'Embedding dimension must be {Config.EMBEDDING_DIM}'}), 400
         
+        if data.get('stream'):
+            chunk_size = data.get('chunk_size', Config.SEARCH_STREAM_CHUNK_SIZE)
+            # bool, int'in alt sınıfı olduğu için ayrıca reddedilir
+            if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or chunk_size < 1:
+                return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+            return Response(
+                stream_with_context(stream_search(query_embeddings, filters, top_k, chunk_size)),
+                mimetype='application/x-ndjson'
+            )
+        
         start_time = time.time()
         
-        with processing_lock:
-            # Search
-            similar_sentences = milvus_client.search_similar(query_embeddings, filters, top_k=top_k)
+        # Kilit yok: pymilvus gRPC çağrıları thread-safe; eşzamanlı aramalar replika/shard'lara dağılır
+        similar_sentences = milvus_client.search_similar(query_embeddings, filters, top_k=top_k)
         
         processing_time = time.time() - start_time
         
@@ -144,6 +228,32 @@ def search_sentences():
         logger.error(f"Search error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def stream_search(query_embeddings, filters, top_k, chunk_size):
+    """Sorgu batch'ini parçalara bölüp sonuçları NDJSON satırları olarak üret"""
+    start_time = time.time()
+    
+    for offset in range(0, len(query_embeddings), chunk_size):
+        chunk = query_embeddings[offset:offset + chunk_size]
+        
+        similar_sentences = milvus_client.search_similar(chunk, filters, top_k=top_k)
+        
+        # search_similar hata durumunda boş liste döndürür
+        if not similar_sentences:
+            logger.error(f"Stream search failed at offset {offset}")
+            yield json.dumps({'error': 'Search failed', 'offset': offset}, ensure_ascii=False) + '\n'
+            return
+        
+        yield json.dumps({
+            'offset': offset,
+            'similar_sentences': similar_sentences
+        }, ensure_ascii=False) + '\n'
+    
+    yield json.dumps({
+        'status': 'success',
+        'total': len(query_embeddings),
+        'processing_time': time.time() - start_time
+    }) + '\n'
+
 # Flask uygulamasını doğrudan çalıştırmak için
 if __name__ == '__main__':
     app.run(host=Config.API_HOST, port=Config.API_PORT, debug=Config.DEBUG)
\ No newline at end of file
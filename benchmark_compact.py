@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kompakt Depolama Recall Benchmark'ı
+===================================
+
+PCA ile küçültülmüş vektörlerde arama (+ tam hassasiyetli yeniden sıralama)
+sonuçlarını tam 768-d arama ile karşılaştırır ve recall@k raporlar.
+
+Korpus örneği mevcut tam boyutlu koleksiyondan, bir .npy dosyasından veya
+--synthetic ile üretilen sentetik vektörlerden alınır; sorgular korpustan ayrılan embedding'lerdir. Aramalar brute-force
+yapıldığı için ölçülen kayıp yalnızca boyut indirgemesinden kaynaklanır.
+"""
+
+import argparse
+import time
+import numpy as np
+
+from config import Config
+from projection import PCAProjection, sample_embeddings
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_k_indices(queries, corpus, k):
+    """Normalize edilmiş vektörlerde exact cosine top-k"""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+def synthetic_embeddings(n, dim=768, topics=200, seed=7):
+    """Cümle embedding'lerini taklit eden sentetik vektörler
+
+    Konu kümeleri, azalan (1/i) özdeğer spektrumu ve ortak bir ortalama kayması
+    içerir. Gerçek model embedding'lerinin yerini tutmaz; yalnızca tekrarlanabilir
+    bir karşılaştırma için kullanılır.
+    """
+    rng = np.random.default_rng(seed)
+    eigenvalues = np.arange(1, dim + 1) ** -1.0
+    basis = np.linalg.qr(rng.normal(size=(dim, dim)))[0]
+    centers = (rng.normal(size=(topics, dim)) * np.sqrt(eigenvalues)) @ basis.T * 2.0
+    labels = rng.integers(0, topics, n)
+    vectors = centers[labels] + (rng.normal(size=(n, dim)) * np.sqrt(eigenvalues)) @ basis.T
+    vectors += rng.normal(size=dim) * 0.3
+    return vectors.astype(np.float32)
+
+def parse_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of compact storage vs full 768-d search")
+    parser.add_argument('--collection', nargs='+', default=None,
+                        help="Full-dimension source collections (default: all shards)")
+    parser.add_argument('--npy', help="Use embeddings from a .npy file instead of Milvus")
+    parser.add_argument('--synthetic', action='store_true',
+                        help="Use reproducible synthetic vectors (sample-size of them) instead of Milvus")
+    parser.add_argument('--sample-size', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--dims', type=parse_list, default=[Config.COMPACT_DIM], help="Comma-separated, e.g. 128,256,384")
+    parser.add_argument('--candidates', type=parse_list, default=[Config.RERANK_CANDIDATES],
+                        help="Comma-separated re-rank pool sizes, e.g. 10,20,50,100")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--projection', help="Existing projection (.npz); fitted on the corpus if omitted")
+    args = parser.parse_args()
+
+    if args.npy:
+        vectors = np.load(args.npy).astype(np.float32)
+    elif args.synthetic:
+        vectors = synthetic_embeddings(args.sample_size)
+    else:
+        from pymilvus import connections
+        from milvus_client import MilvusClient
+        connections.connect("default", host=Config.MILVUS_HOST, port=Config.MILVUS_PORT)
+        collection_names = args.collection or MilvusClient.collection_names(compact=False)
+        vectors = sample_embeddings(collection_names, args.sample_size)
+
+    rng = np.random.default_rng(42)
+    rng.shuffle(vectors)
+    vectors = vectors[:args.sample_size]
+    queries, corpus = vectors[:args.queries], vectors[args.queries:]
+    print(f"📊 Corpus: {len(corpus)} vectors, queries: {len(queries)}, k={args.k}")
+
+    full_corpus, full_queries = normalize(corpus), normalize(queries)
+    start = time.time()
+    truth = top_k_indices(full_queries, full_corpus, args.k)
+    full_time = time.time() - start
+
+    print(f"{'Mode':<28}{'recall@' + str(args.k):>12}{'search (s)':>12}{'bytes/vector':>14}")
+    print(f"{'full ' + str(corpus.shape[1]) + '-d':<28}{1.0:>12.4f}{full_time:>12.3f}{corpus.shape[1] * 4:>14}")
+
+    projections = [PCAProjection.load(args.projection)] if args.projection else [
+        PCAProjection.fit(corpus, dim) for dim in args.dims
+    ]
+    for projection in projections:
+        compact_corpus, compact_queries = projection.transform(corpus), projection.transform(queries)
+
+        start = time.time()
+        compact_only = top_k_indices(compact_queries, compact_corpus, args.k)
+        compact_time = time.time() - start
+        print(f"{'compact ' + str(projection.dim) + '-d':<28}{recall_at_k(truth, compact_only):>12.4f}"
+              f"{compact_time:>12.3f}{projection.dim * 4:>14}")
+
+        # Aday havuzunu kompakt vektörlerde bul, tam vektörlerle yeniden sırala
+        for pool in args.candidates:
+            start = time.time()
+            candidates = top_k_indices(compact_queries, compact_corpus, max(args.k, pool))
+            reranked = []
+            for query, candidate_ids in zip(full_queries, candidates):
+                scores = full_corpus[candidate_ids] @ query
+                reranked.append(candidate_ids[scores.argsort()[::-1][:args.k]])
+            rerank_time = time.time() - start
+            label = f"  + rerank@{pool}"
+            print(f"{label:<28}{recall_at_k(truth, np.array(reranked)):>12.4f}"
+                  f"{rerank_time:>12.3f}{projection.dim * 4:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import nltk
 import requests
 import json
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
 # NLTK data download
 try:
@@ -63,8 +63,21 @@ class LocalEmbeddingClient:
         """Tek cümle için embedding"""
         return self.model.encode(sentence).tolist()
     
+    def _create_query_embeddings(self, query_sentences: List[str]) -> List[List[float]]:
+        """Arama cümleleri için embedding; çok kısa cümleler sıfır vektör alır"""
+        query_embeddings = []
+        for sentence in query_sentences:
+            clean_sentence = sentence.strip()
+            if len(clean_sentence.split()) >= 3:
+                query_embeddings.append(self.create_single_embedding(clean_sentence))
+            else:
+                # Boş embedding
+                query_embeddings.append([0.0] * self.model.get_sentence_embedding_dimension())
+        return query_embeddings
+    
     def insert_episode(self, project_name: str, season: int, episode_number: int, 
-                      timecode: str, content: str) -> Dict[str, Any]:
+                      timecode: str, content: str, upsert: bool = True,
+                      replace: bool = False) -> Dict[str, Any]:
         """
         Dizi bölümünü işleyip sunucuya gönder
         
@@ -74,6 +87,8 @@ class LocalEmbeddingClient:
             episode_number: Bölüm numarası
             timecode: Zaman kodu (örn: "00:15:30")
             content: Bölüm metni
+            upsert: Tekrar gönderimde cümleleri çoğaltmadan üzerine yaz
+            replace: Eklemeden önce bölümün tüm cümlelerini sil
         """
         print(f"📝 Processing episode: {project_name} - S{season}E{episode_number} @ {timecode}")
         
@@ -94,7 +109,9 @@ class LocalEmbeddingClient:
             "project_name": project_name,
             "season": season,
             "episode_number": episode_number,
-            "timecode": timecode
+            "timecode": timecode,
+            "upsert": upsert,
+            "replace": replace
         }
         
         try:
@@ -118,6 +135,63 @@ class LocalEmbeddingClient:
             print(f"❌ {error_msg}")
             return {"error": error_msg}
     
+    def delete_episode(self, project_name: str, season: int, episode_number: int,
+                       compact: bool = False) -> Dict[str, Any]:
+        """
+        Bir bölümün tüm cümlelerini sil
+        
+        Args:
+            project_name: Dizi adı
+            season: Sezon numarası
+            episode_number: Bölüm numarası
+            compact: Silme sonrası segment alanını geri kazanmak için compaction başlat
+        """
+        return self._post_delete({
+            "project_name": project_name,
+            "season": season,
+            "episode_number": episode_number,
+            "compact": compact
+        })
+    
+    def delete_season(self, project_name: str, season: int, compact: bool = False) -> Dict[str, Any]:
+        """
+        Bir sezonun tüm bölümlerindeki cümleleri sil
+        
+        Args:
+            project_name: Dizi adı
+            season: Sezon numarası
+            compact: Silme sonrası segment alanını geri kazanmak için compaction başlat
+        """
+        return self._post_delete({
+            "project_name": project_name,
+            "season": season,
+            "scope": "season",
+            "compact": compact
+        })
+    
+    def _post_delete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Silme isteğini sunucuya gönder"""
+        try:
+            response = requests.post(
+                f"{self.server_url}/delete_sentences",
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                print(f"🗑️ {result.get('message', 'Deleted')}")
+                return result
+            else:
+                error_msg = f"Server error: {response.status_code}"
+                print(f"❌ {error_msg}")
+                return {"error": error_msg}
+                
+        except requests.exceptions.RequestException as e:
+            error_msg = f"Connection error: {str(e)}"
+            print(f"❌ {error_msg}")
+            return {"error": error_msg}
+    
     def search_sentences(self, query_sentences: List[str], 
                         filters: Dict[str, Any] = None, 
                         top_k: int = 1) -> Dict[str, Any]:
@@ -132,14 +206,7 @@ class LocalEmbeddingClient:
         print(f"🔍 Searching for {len(query_sentences)} sentences...")
         
         # Embeddings oluştur
-        query_embeddings = []
-        for sentence in query_sentences:
-            clean_sentence = sentence.strip()
-            if len(clean_sentence.split()) >= 3:
-                query_embeddings.append(self.create_single_embedding(clean_sentence))
-            else:
-                # Boş embedding
-                query_embeddings.append([0.0] * 768)
+        query_embeddings = self._create_query_embeddings(query_sentences)
         
         # Sunucuya gönder
         payload = {
@@ -169,6 +236,59 @@ class LocalEmbeddingClient:
             print(f"❌ {error_msg}")
             return {"error": error_msg}
 
+    def search_sentences_stream(self, query_sentences: List[str],
+                                filters: Dict[str, Any] = None,
+                                top_k: int = 1,
+                                chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Büyük arama batch'lerini NDJSON streaming ile ara
+        
+        Sunucu sorguları chunk_size'lık parçalar halinde arar ve her parçanın sonucunu
+        hazır olur olmaz gönderir. Her eleman {"offset": ..., "similar_sentences": [...]}
+        biçimindedir; son eleman özet ({"status": "success", ...}) veya hatadır.
+        
+        Args:
+            query_sentences: Arama cümleleri
+            filters: Filtreleme seçenekleri
+            top_k: Her cümle için kaç benzer cümle döndürülecek
+            chunk_size: Sunucunun parça başına işleyeceği sorgu sayısı
+        """
+        print(f"🔍 Streaming search for {len(query_sentences)} sentences...")
+        
+        # Embeddings oluştur
+        query_embeddings = self._create_query_embeddings(query_sentences)
+        
+        # Sunucuya gönder
+        payload = {
+            "embeddings": query_embeddings,
+            "filters": filters or {},
+            "top_k": top_k,
+            "stream": True,
+            "chunk_size": chunk_size
+        }
+        
+        try:
+            with requests.post(
+                f"{self.server_url}/search_sentences",
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    error_msg = f"Server error: {response.status_code}"
+                    print(f"❌ {error_msg}")
+                    yield {"error": error_msg}
+                    return
+                
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield json.loads(line)
+                
+        except requests.exceptions.RequestException as e:
+            error_msg = f"Connection error: {str(e)}"
+            print(f"❌ {error_msg}")
+            yield {"error": error_msg}
+
 # İstemci sadece istemci ortamında kullanılacak; sunucu deploy'unda tetiklenmesin diye
 if __name__ == "__main__":
     print("Bu modül istemci tarafında embedding üretmek için tasarlanmıştır.")
@@ -23,6 +23,15 @@ class Config:
     ENABLE_STORAGE_V2 = True  # Storage Format V2 desteği
     CONNECTION_TIMEOUT = 30   # Bağlantı timeout süresi
     SEARCH_TIMEOUT = 60       # Arama timeout süresi
+    SEARCH_STREAM_CHUNK_SIZE = 500  # NDJSON streaming aramada parça başına sorgu sayısı
+    
+    # Okuma ölçekleme ayarları
+    COLLECTION_NAME = os.getenv('MILVUS_COLLECTION', 'tv_series_sentences')
+    REPLICA_NUMBER = int(os.getenv('MILVUS_REPLICA_NUMBER', '1'))  # Bellekteki replika sayısı
+    # Virgülle ayrılmış resource group listesi (boşsa varsayılan grup)
+    RESOURCE_GROUPS = [g.strip() for g in os.getenv('MILVUS_RESOURCE_GROUPS', '').split(',') if g.strip()]
+    # Proje hash'ine göre veri kaç koleksiyona bölünecek; değiştirilirse veri yeniden yüklenmeli
+    COLLECTION_SHARDS = int(os.getenv('MILVUS_COLLECTION_SHARDS', '1'))
     
     # Log ayarları
     LOG_LEVEL = 'INFO'
@@ -30,4 +39,10 @@ class Config:
     PROJECT_ROOT = os.getenv('MILVUS_RAG_ROOT', os.path.dirname(os.path.abspath(__file__)))
     # Log dizini (env ile override edilebilir); varsayılan olarak proje altındaki logs/
     LOG_DIR = os.getenv('MILVUS_RAG_LOG_DIR', os.path.join(PROJECT_ROOT, 'logs'))
-    LOG_FILE = os.path.join(LOG_DIR, 'app.log')
\ No newline at end of file
+    LOG_FILE = os.path.join(LOG_DIR, 'app.log')
+    
+    # Kompakt depolama: ANN index'i PCA ile küçültülmüş vektörlerde, sonuçlar tam 768-d ile yeniden sıralanır
+    COMPACT_STORAGE = os.getenv('MILVUS_COMPACT_STORAGE', 'false').lower() == 'true'
+    COMPACT_DIM = int(os.getenv('MILVUS_COMPACT_DIM', '256'))
+    RERANK_CANDIDATES = int(os.getenv('MILVUS_RERANK_CANDIDATES', '50'))  # Yeniden sıralanacak aday sayısı
+    PCA_MODEL_PATH = os.getenv('MILVUS_PCA_MODEL_PATH', os.path.join(PROJECT_ROOT, 'data', 'pca_projection.npz'))
@@ -1,14 +1,24 @@
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import logging
+import numpy as np
 from config import Config
+from projection import PCAProjection, cosine_scores
 
 logger = logging.getLogger(__name__)
 
 class MilvusClient:
     def __init__(self):
         self.collection = None
+        self.collections = []
+        self.projection = None
+        self.search_executor = None
         self.connect()
         self.setup_collection()
+        # Scatter-gather aramalar için shard sayısı kadar kalıcı worker
+        if len(self.collections) > 1:
+            self.search_executor = ThreadPoolExecutor(max_workers=len(self.collections))
     
     def connect(self):
         """Milvus'a bağlan"""
@@ -32,41 +42,119 @@ class MilvusClient:
             raise
     
     def setup_collection(self):
-        """Collection oluştur veya bağlan"""
+        """Collection(lar) oluştur veya bağlan"""
+        embedding_dim = Config.EMBEDDING_DIM
+        if Config.COMPACT_STORAGE:
+            # ANN index'i PCA ile küçültülmüş vektörlerde tutulur
+            self.projection = PCAProjection.load(Config.PCA_MODEL_PATH)
+            embedding_dim = self.projection.dim
+            logger.info(f"Compact storage enabled: {Config.EMBEDDING_DIM} -> {embedding_dim} dims")
+        
         fields = [
-            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=Config.EMBEDDING_DIM),
+            # Deterministik primary key: proje/sezon/bölüm/timecode/cümle sırası hash'i
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=embedding_dim),
             FieldSchema(name="sentence", dtype=DataType.VARCHAR, max_length=1000),
             FieldSchema(name="project_name", dtype=DataType.VARCHAR, max_length=100),
             FieldSchema(name="season", dtype=DataType.INT64),
             FieldSchema(name="episode_number", dtype=DataType.INT64),
             FieldSchema(name="timecode", dtype=DataType.VARCHAR, max_length=50),
         ]
+        if self.projection:
+            # Yeniden sıralama için tam hassasiyetli vektör; mmap ile bellek yerine diskte tutulur
+            fields.append(FieldSchema(name="full_embedding", dtype=DataType.FLOAT_VECTOR,
+                                      dim=Config.EMBEDDING_DIM, mmap_enabled=True))
         
-        schema = CollectionSchema(fields, "Turkish TV Series Sentences")
-        
-        collection_name = "tv_series_sentences"
+        description = "Turkish TV Series Sentences"
+        if self.projection:
+            # Kayıtlı vektörlerin hangi PCA tabanıyla üretildiği koleksiyonda saklanır
+            description += f" | pca:{self.projection.fingerprint}"
+        schema = CollectionSchema(fields, description)
         
+        self.collections = [self.open_collection(name, schema) for name in self.collection_names()]
+        # Tek koleksiyonlu kurulumlarla uyumluluk için ilk shard
+        self.collection = self.collections[0]
+    
+    @staticmethod
+    def collection_names(compact=None):
+        """Shard koleksiyon adları; ilk shard mevcut koleksiyon adını korur"""
+        base = Config.COLLECTION_NAME
+        if Config.COMPACT_STORAGE if compact is None else compact:
+            # Şema farklı olduğu için kompakt mod ayrı koleksiyon kullanır
+            base = f"{base}_compact"
+        return [base] + [f"{base}_shard{i}" for i in range(1, max(Config.COLLECTION_SHARDS, 1))]
+    
+    def open_collection(self, collection_name, schema):
+        """Tek bir koleksiyonu oluştur/bağlan ve yükle"""
         # Milvus v2.6.0 için geliştirilmiş collection yönetimi
         if utility.has_collection(collection_name):
-            self.collection = Collection(collection_name)
+            collection = Collection(collection_name)
             logger.info(f"Connected to existing collection: {collection_name}")
+            if self.projection:
+                self.check_projection(collection)
         else:
-            self.collection = Collection(collection_name, schema)
-            self.create_index()
+            collection = Collection(collection_name, schema)
+            self.create_index(collection)
+            if self.projection:
+                # Milvus tüm vektör alanlarında index ister; FLAT ek yapı oluşturmaz
+                # Index verisi de mmap ile diskte kalır; aksi halde 768-d veri RAM'e yüklenir
+                collection.create_index("full_embedding", {
+                    "metric_type": "COSINE",
+                    "index_type": "FLAT",
+                    "params": {"mmap.enabled": True}
+                })
             logger.info(f"Created new collection: {collection_name}")
         
+        # Eski şemayla (auto_id=True) oluşturulmuş koleksiyonlarda id gönderilemez
+        if collection.schema.auto_id:
+            logger.warning(f"Collection {collection_name} uses auto_id; upsert falls back to delete + insert")
+        
+        self.load_collection(collection)
+        return collection
+    
+    def check_projection(self, collection):
+        """Yüklenen PCA tabanının koleksiyondaki vektörlerle aynı olduğunu doğrula"""
+        expected = f"pca:{self.projection.fingerprint}"
+        if "pca:" not in collection.description:
+            logger.warning(f"Collection {collection.name} has no PCA fingerprint; cannot verify projection")
+        elif expected not in collection.description:
+            # Farklı tabanla projekte edilen sorgular sessizce yanlış sonuç döndürür
+            raise RuntimeError(
+                f"PCA projection {Config.PCA_MODEL_PATH} ({expected}) does not match collection "
+                f"{collection.name} ({collection.description}); restore the original projection or re-ingest"
+            )
+    
+    @staticmethod
+    def load_kwargs():
+        """load() için yapılandırılan replika sayısı ve resource group'lar"""
+        load_kwargs = {'replica_number': Config.REPLICA_NUMBER}
+        if Config.RESOURCE_GROUPS:
+            load_kwargs['_resource_groups'] = Config.RESOURCE_GROUPS
+        return load_kwargs
+    
+    def load_collection(self, collection):
+        """Koleksiyonu yapılandırılan replika sayısı ve resource group'larla yükle"""
+        load_kwargs = self.load_kwargs()
+        
         # Koleksiyonu yükle (idempotent). Yeni oluşturulmuş veya boş koleksiyonlarda
         # loading_progress çağrısı hata verebildiği için doğrudan load() kullanıyoruz.
         try:
-            self.collection.load()
-            logger.info(f"Collection {collection_name} loaded successfully")
+            collection.load(**load_kwargs)
+            logger.info(f"Collection {collection.name} loaded with {Config.REPLICA_NUMBER} replica(s)")
         except Exception as load_error:
             # Bazı durumlarda zaten yüklüyse veya arka planda yükleniyorsa hata dönmeyebilir/önemsizdir
             logger.warning(f"Collection load call returned non-critical error: {load_error}")
     
-    def create_index(self):
+    def collection_for(self, project_name):
+        """Projenin verisini tutan shard koleksiyonunu döndür"""
+        if len(self.collections) == 1:
+            return self.collections[0]
+        digest = hashlib.blake2b(project_name.encode('utf-8'), digest_size=8).digest()
+        return self.collections[int.from_bytes(digest, 'big') % len(self.collections)]
+    
+    def create_index(self, collection=None):
         """Index oluştur - Milvus v2.6.0 optimizasyonları ile"""
+        collection = collection or self.collection
         # v2.6.0'da RaBitQ 1-bit quantization desteği
         index_params = {
             "metric_type": "COSINE",
@@ -79,7 +167,7 @@ class MilvusClient:
         }
         
         try:
-            self.collection.create_index("embedding", index_params)
+            collection.create_index("embedding", index_params)
             logger.info("Index created successfully with v2.6.0 optimizations")
         except Exception as e:
             # Fallback to basic index if advanced features fail
@@ -88,11 +176,51 @@ class MilvusClient:
                 "index_type": "IVF_FLAT",
                 "params": {"nlist": Config.INDEX_NLIST}
             }
-            self.collection.create_index("embedding", basic_params)
+            collection.create_index("embedding", basic_params)
             logger.info("Index created with basic configuration")
     
-    def insert_sentences(self, sentences, project_name, season, episode_number, timecode, embeddings):
-        """Cümleleri ekle"""
+    @staticmethod
+    def sentence_id(project_name, season, episode_number, timecode, index):
+        """Cümle için deterministik INT64 primary key üret"""
+        key = f"{project_name}\x1f{season}\x1f{episode_number}\x1f{timecode}\x1f{index}"
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        # Milvus INT64 işaretli; pozitif aralıkta kalmak için 63 bit kullan
+        return int.from_bytes(digest, 'big') & 0x7FFFFFFFFFFFFFFF
+    
+    @staticmethod
+    def build_scope_expr(project_name, season=None, episode_number=None, timecode=None):
+        """Proje/sezon/bölüm kapsamı için filtre ifadesi oluştur
+        
+        İfade silme işlemlerinde kullanıldığı için değerler ifadeye gömülmeden önce doğrulanır.
+        """
+        if not isinstance(project_name, str) or not project_name:
+            raise ValueError('project_name is required')
+        for name, value in (('project_name', project_name), ('timecode', timecode)):
+            if value is not None and (not isinstance(value, str) or '"' in value or '\\' in value):
+                raise ValueError(f'{name} must be a string without quotes or backslashes')
+        for name, value in (('season', season), ('episode_number', episode_number)):
+            # bool, int'in alt sınıfı olduğu için ayrıca reddedilir
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                raise ValueError(f'{name} must be an integer')
+        
+        conditions = [f'project_name == "{project_name}"']
+        if season is not None:
+            conditions.append(f'season == {season}')
+        if episode_number is not None:
+            conditions.append(f'episode_number == {episode_number}')
+        if timecode is not None:
+            conditions.append(f'timecode == "{timecode}"')
+        return " && ".join(conditions)
+    
+    def insert_sentences(self, sentences, project_name, season, episode_number, timecode, embeddings,
+                         upsert=False, replace=False):
+        """Cümleleri ekle
+        
+        Deterministik primary key'li koleksiyonlarda yazma her zaman upsert'tür; Milvus
+        PK tekilliğini zorlamadığı için insert tekrar gönderimde aynı id'li kopyalar üretir.
+        upsert bayrağı yalnızca eski auto_id şemasında (silme + insert) anlam taşır.
+        replace=True önce bölümün tüm cümlelerini siler, sonra ekler.
+        """
         try:
             data = [
                 embeddings,
@@ -102,22 +230,75 @@ class MilvusClient:
                 [episode_number] * len(sentences),
                 [timecode] * len(sentences)
             ]
+            if self.projection:
+                data[0] = self.projection.transform(embeddings).tolist()
+                data.append(embeddings)
 
-            # Milvus insert expects column order to match schema without the auto_id primary key
-            self.collection.insert(data)
-            self.collection.flush()
-            self.collection.load()
+            collection = self.collection_for(project_name)
 
-            logger.info(f"Inserted {len(sentences)} sentences")
+            if replace:
+                collection.delete(self.build_scope_expr(project_name, season, episode_number))
+
+            if collection.schema.auto_id:
+                # Eski şema: id gönderilemediği için upsert'i segment silme + insert ile taklit et
+                if upsert and not replace:
+                    collection.delete(self.build_scope_expr(project_name, season, episode_number, timecode))
+                collection.insert(data)
+            else:
+                ids = [
+                    self.sentence_id(project_name, season, episode_number, timecode, i)
+                    for i in range(len(sentences))
+                ]
+                collection.upsert([ids] + data)
+            collection.flush()
+            self.load_collection(collection)
+
+            logger.info(f"Stored {len(sentences)} sentences in {collection.name}")
             return True
 
         except Exception as e:
             logger.error(f"Insert failed: {e}")
             return False
     
+    def delete_sentences(self, project_name, season=None, episode_number=None, compact=False):
+        """Bir bölümün veya sezonun tüm cümlelerini tek ifadeyle sil"""
+        try:
+            collection = self.collection_for(project_name)
+            expr = self.build_scope_expr(project_name, season, episode_number)
+            result = collection.delete(expr)
+            collection.flush()
+            
+            if compact:
+                self.compact(collection)
+            
+            logger.info(f"Deleted {result.delete_count} sentences where {expr}")
+            return result.delete_count
+        
+        except Exception as e:
+            logger.error(f"Delete failed: {e}")
+            return None
+    
+    def compact(self, collection=None):
+        """Silinen satırların segment alanını geri kazan (arka planda çalışır)"""
+        try:
+            for target in ([collection] if collection else self.collections):
+                target.compact()
+                logger.info(f"Compaction triggered for {target.name}")
+            return True
+        except Exception as e:
+            logger.error(f"Compaction failed: {e}")
+            return False
+    
     def search_similar(self, query_embeddings, filters=None, top_k=1):
         """Benzer cümleleri ara - Milvus v2.6.0 gelişmiş arama özellikleri"""
         try:
+            # Kompakt modda ANN adayları fazladan alınır ve tam vektörlerle yeniden sıralanır
+            search_vectors = query_embeddings
+            search_limit = top_k
+            if self.projection:
+                search_vectors = self.projection.transform(query_embeddings).tolist()
+                search_limit = max(top_k, Config.RERANK_CANDIDATES)
+            
             # v2.6.0'da geliştirilmiş arama parametreleri
             search_params = {
                 "metric_type": "COSINE",
@@ -146,21 +327,38 @@ class MilvusClient:
                 if conditions:
                     filter_expr = " && ".join(conditions)
             
-            results = self.collection.search(
-                data=query_embeddings,
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                expr=filter_expr,
-                output_fields=["sentence"]
-            )
+            def search_collection(collection):
+                return collection.search(
+                    data=search_vectors,
+                    anns_field="embedding",
+                    param=search_params,
+                    limit=search_limit,
+                    expr=filter_expr,
+                    output_fields=["sentence"]
+                )
+            
+            # Proje filtresi varsa yalnızca ilgili shard'ı, yoksa tüm shard'ları ara (scatter-gather)
+            if filters and filters.get('project_name'):
+                targets = [self.collection_for(filters['project_name'])]
+            else:
+                targets = self.collections
+            
+            if len(targets) == 1:
+                shard_results = [search_collection(targets[0])]
+            else:
+                shard_results = list(self.search_executor.map(search_collection, targets))
             
             # Her sorgu embedding'i için en iyi eşleşmeyi döndür
             similar_sentences = []
-            for hits in results:
-                if hits and len(hits) > 0:
+            merged = self.merge_hits(shard_results, targets, len(query_embeddings), search_limit)
+            if self.projection:
+                merged = self.rerank(merged, query_embeddings, top_k)
+            
+            for hits in merged:
+                if hits:
                     # Top-1 cümlenin ham içeriğini al
-                    similar_sentences.append(hits[0].entity.get('sentence'))
+                    _, best = hits[0]
+                    similar_sentences.append(best.entity.get('sentence'))
                 else:
                     similar_sentences.append("")
 
@@ -170,11 +368,64 @@ class MilvusClient:
             logger.error(f"Search failed: {e}")
             return []
     
+    @staticmethod
+    def merge_hits(shard_results, targets, num_queries, top_k):
+        """Shard sonuçlarını sorgu bazında birleştirip global top-k (shard, hit) çiftleri döndür"""
+        merged = []
+        for i in range(num_queries):
+            hits = [(collection, hit) for collection, results in zip(targets, shard_results) for hit in results[i]]
+            # COSINE metriğinde büyük distance daha benzer demek
+            hits.sort(key=lambda pair: pair[1].distance, reverse=True)
+            merged.append(hits[:top_k])
+        return merged
+    
+    def rerank(self, merged, query_embeddings, top_k):
+        """ANN adaylarını tam hassasiyetli cosine skoruna göre yeniden sırala
+        
+        Tam vektörler arama sonucuyla değil, sorgu grupları halinde id ile çekilir;
+        böylece bellekte aynı anda en fazla ~BATCH_SIZE tam vektör bulunur.
+        """
+        group_size = max(1, Config.BATCH_SIZE // max(Config.RERANK_CANDIDATES, 1))
+        reranked = []
+        for start in range(0, len(merged), group_size):
+            group = merged[start:start + group_size]
+            # Her aday yalnızca geldiği shard'dan okunur
+            ids_by_collection = {}
+            for hits in group:
+                for collection, hit in hits:
+                    ids_by_collection.setdefault(collection.name, (collection, set()))[1].add(hit.id)
+            full_embeddings = {}
+            for collection, ids in ids_by_collection.values():
+                full_embeddings.update(self.fetch_full_embeddings(collection, list(ids)))
+            
+            for hits, query_embedding in zip(group, query_embeddings[start:start + group_size]):
+                hits = [pair for pair in hits if pair[1].id in full_embeddings]
+                if not hits:
+                    reranked.append(hits)
+                    continue
+                scores = cosine_scores(query_embedding, [full_embeddings[hit.id] for _, hit in hits])
+                reranked.append([hits[i] for i in scores.argsort()[::-1][:top_k]])
+        return reranked
+    
+    @staticmethod
+    def fetch_full_embeddings(collection, ids):
+        """Aday id'lerinin tam hassasiyetli vektörlerini parça parça oku"""
+        full_embeddings = {}
+        for start in range(0, len(ids), Config.BATCH_SIZE):
+            id_list = ", ".join(str(i) for i in ids[start:start + Config.BATCH_SIZE])
+            rows = collection.query(expr=f"id in [{id_list}]", output_fields=["full_embedding"])
+            for row in rows:
+                full_embeddings[row['id']] = np.asarray(row['full_embedding'], dtype=np.float32)
+        return full_embeddings
+    
     def get_stats(self):
         """İstatistikler"""
         return {
-            'total_sentences': self.collection.num_entities,
-            'collection_name': self.collection.name
+            'total_sentences': sum(collection.num_entities for collection in self.collections),
+            'collection_name': self.collection.name,
+            'collections': [collection.name for collection in self.collections],
+            'replica_number': Config.REPLICA_NUMBER,
+            'embedding_dim': self.projection.dim if self.projection else Config.EMBEDDING_DIM
         }
     
     def health_check(self):
@@ -183,16 +434,22 @@ class MilvusClient:
             # Bağlantı durumunu kontrol et
             server_version = utility.get_server_version()
             
-            # Collection durumunu kontrol et
-            collection_stats = utility.get_collection_stats(self.collection.name)
-            loading_progress = utility.loading_progress(self.collection.name)
+            # Collection durumlarını kontrol et
+            collection_loaded = True
+            total_entities = 0
+            for collection in self.collections:
+                collection_stats = utility.get_collection_stats(collection.name)
+                loading_progress = utility.loading_progress(collection.name)
+                collection_loaded = collection_loaded and loading_progress['loading_progress'] == '100%'
+                total_entities += int(collection_stats['row_count'])
             
             return {
                 'status': 'healthy',
                 'server_version': server_version,
-                'collection_loaded': loading_progress['loading_progress'] == '100%',
-                'total_entities': collection_stats['row_count'],
-                'collection_name': self.collection.name
+                'collection_loaded': collection_loaded,
+                'total_entities': total_entities,
+                'collection_name': self.collection.name,
+                'collections': [collection.name for collection in self.collections]
             }
         except Exception as e:
             logger.error(f"Health check failed: {e}")
@@ -0,0 +1,136 @@
+import os
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PCAProjection:
+    """Embedding'leri daha düşük boyuta indiren PCA projeksiyonu"""
+
+    def __init__(self, mean, components):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @property
+    def fingerprint(self):
+        """Projeksiyon tabanının kısa hash'i; koleksiyonla eşleşmeyi doğrulamak için"""
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def fit(cls, embeddings, dim):
+        """Korpustan alınmış örnek embedding'ler üzerinde PCA eğit"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.shape[0] < dim:
+            raise ValueError(f"Need at least {dim} sample vectors, got {vectors.shape[0]}")
+
+        mean = vectors.mean(axis=0)
+        # SVD ile en büyük varyans yönlerini bul
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        explained = (singular_values[:dim] ** 2).sum() / (singular_values ** 2).sum()
+        logger.info(f"PCA fitted: {vectors.shape[1]} -> {dim} dims, explained variance {explained:.3f}")
+        return cls(mean, vt[:dim])
+
+    def transform(self, embeddings):
+        """Embedding'leri projekte et ve COSINE araması için normalize et"""
+        projected = (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return projected / np.maximum(norms, 1e-12)
+
+    def save(self, path):
+        """Projeksiyonu .npz dosyasına kaydet"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components)
+        logger.info(f"PCA projection saved: {path}")
+
+    @classmethod
+    def load(cls, path):
+        """Kaydedilmiş projeksiyonu yükle"""
+        data = np.load(path)
+        return cls(data['mean'], data['components'])
+
+def cosine_scores(query_embedding, candidate_embeddings):
+    """Tam hassasiyetli cosine benzerlik skorları"""
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    norms = np.linalg.norm(candidates, axis=1) * np.linalg.norm(query)
+    return (candidates @ query) / np.maximum(norms, 1e-12)
+
+def sample_embeddings(collection_names, sample_size, field="embedding", seed=42, batch_size=1000):
+    """Milvus koleksiyonlarından (tüm shard'lar) rastgele örnek embedding'ler oku
+    
+    Önce tüm shard'lardaki id'ler okunur ve rastgele alt küme seçilir; böylece örnek
+    ilk yüklenen projelere veya tek bir shard'a değil tüm korpusa yayılır.
+    """
+    from pymilvus import Collection, utility
+    from pymilvus.client.types import LoadState
+    from milvus_client import MilvusClient
+
+    collections = []
+    shard_ids = []
+    for collection_name in collection_names:
+        collection = Collection(collection_name)
+        # Canlı koleksiyonun replika/resource group ayarını bozmamak için yalnızca yüklü değilse yükle
+        if utility.load_state(collection_name) != LoadState.Loaded:
+            collection.load(**MilvusClient.load_kwargs())
+
+        ids = []
+        iterator = collection.query_iterator(batch_size=10000, output_fields=["id"])
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                ids.extend(row["id"] for row in batch)
+        finally:
+            iterator.close()
+        collections.append(collection)
+        shard_ids.append(np.asarray(ids, dtype=np.int64))
+
+    # Shard'lar arasında tek tip örnekleme: global sıra numaraları üzerinden seç
+    total = sum(len(ids) for ids in shard_ids)
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(total, size=sample_size, replace=False)) if total > sample_size else np.arange(total)
+    offsets = np.cumsum([0] + [len(ids) for ids in shard_ids])
+
+    vectors = []
+    for collection, ids, offset, end in zip(collections, shard_ids, offsets[:-1], offsets[1:]):
+        selected = ids[picks[(picks >= offset) & (picks < end)] - offset].tolist()
+        for start in range(0, len(selected), batch_size):
+            id_list = ", ".join(str(i) for i in selected[start:start + batch_size])
+            rows = collection.query(expr=f"id in [{id_list}]", output_fields=[field])
+            vectors.extend(row[field] for row in rows)
+    return np.asarray(vectors, dtype=np.float32)
+
+# PCA projeksiyonunu mevcut (tam boyutlu) koleksiyondan örnekleyerek eğit
+if __name__ == "__main__":
+    import argparse
+    from pymilvus import connections
+    from config import Config
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
+
+    parser = argparse.ArgumentParser(description="Fit PCA projection for compact storage")
+    parser.add_argument('--collection', nargs='+', default=None,
+                        help="Full-dimension source collections (default: all shards)")
+    parser.add_argument('--sample-size', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=Config.COMPACT_DIM)
+    parser.add_argument('--output', default=Config.PCA_MODEL_PATH)
+    parser.add_argument('--force', action='store_true',
+                        help="Overwrite an existing projection (stored _compact vectors must be re-ingested)")
+    args = parser.parse_args()
+
+    # Sunucunun kullandığı tabanı değiştirmek kayıtlı kompakt vektörleri geçersiz kılar
+    if os.path.exists(args.output) and not args.force:
+        parser.error(f"{args.output} already exists; use --force or a different --output")
+
+    connections.connect("default", host=Config.MILVUS_HOST, port=Config.MILVUS_PORT)
+    from milvus_client import MilvusClient
+    collection_names = args.collection or MilvusClient.collection_names(compact=False)
+    sample = sample_embeddings(collection_names, args.sample_size)
+    PCAProjection.fit(sample, args.dim).save(args.output)